@@ -3,17 +3,52 @@ Binance API Client for USDT-M Futures
 Handles all API communication with Binance
 """
 
-import hashlib
 import hmac
+import re
+import threading
 import time
-from typing import Dict, List, Optional, Any
+from math import floor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from urllib.parse import urlencode
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Typed decoding for hot endpoints (optional)
+try:
+    import msgspec
+    
+    class _Ticker(msgspec.Struct):
+        """24h ticker fields used for pair ranking"""
+        symbol: str
+        quoteVolume: float = 0.0
+        priceChangePercent: float = 0.0
+    
+    # strict=False accepts Binance's numeric strings as floats
+    _TICKER_DECODER = msgspec.json.Decoder(List[_Ticker], strict=False)
+except ImportError:
+    _TICKER_DECODER = None
 
 import config
+from json_codec import json_loads
 from logger import logger
 
+# Streaming market data (optional)
+try:
+    from market_data_cache import MarketDataCache
+    MARKET_STREAM_AVAILABLE = True
+except ImportError:
+    MARKET_STREAM_AVAILABLE = False
+
+
+# Static pair filters (config is fixed for the lifetime of the process)
+EXCLUDED_SYMBOL_RE = re.compile(r'_|DEFI|INDEX')  # Delivery, DEFI and INDEX symbols
+_BLACKLIST = frozenset(getattr(config, 'BLACKLIST', ()))
+_MIN_VOLATILITY = float(getattr(config, 'MIN_VOLATILITY_PERCENT', 1.0))
+
 
 class BinanceClient:
     """Client for Binance USDT-M Futures API"""
@@ -21,6 +56,7 @@ class BinanceClient:
     def __init__(self):
         self.api_key = config.API_KEY
         self.api_secret = config.API_SECRET
+        self._secret_bytes = (self.api_secret or '').encode('utf-8')
         self.base_url = config.get_base_url()
         
         self.session = requests.Session()
@@ -28,43 +64,131 @@ class BinanceClient:
             'X-MBX-APIKEY': self.api_key
         })
         
-        # Rate limiting
+        # Connection pool sized for concurrent batch reads; retry transient
+        # gateway errors (POST orders are never retried by urllib3)
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[502, 503, 504],
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        
+        # Rate limiting (shared across batch worker threads)
         self.last_request_time = 0
-        self.min_request_interval = 0.1  # 100ms between requests
+        self.min_request_interval = 0.005  # 5ms safety floor between requests
+        self._rate_lock = threading.Lock()
+        
+        # Concurrency for independent batched reads
+        self.max_batch_workers = 10
+        
+        # Request weight budget (Binance allows 2400 weight per minute per IP).
+        # Bulk scan reads stop at limit - margin so the margin stays free for
+        # position management (mark prices, symbol rules, orders, closes)
+        self.weight_limit = 2400
+        self.weight_safety_margin = 200
+        self._weight_used = 0
+        self._weight_reset = 0
+        
+        # Exchange info cache (symbol rules rarely change)
+        self.exchange_info_ttl = 3600  # seconds
+        self._exchange_info_cache = None
+        self._exchange_info_ts = 0
+        self._symbol_index: Dict[str, Dict] = {}
+        # symbol -> (tick_size, tick_decimals, price_precision, quantity_precision)
+        self._symbol_meta: Dict[str, Tuple[float, int, int, int]] = {}
+        
+        # WebSocket market data cache (REST is used as warm-up and fallback)
+        self.market_data = None
+        if getattr(config, 'MARKET_STREAM_ENABLED', False):
+            if MARKET_STREAM_AVAILABLE:
+                self.market_data = MarketDataCache(config.get_ws_url())
+                self.market_data.start()
+            else:
+                logger.info("websockets not installed - using REST polling for market data")
     
     def _get_timestamp(self) -> int:
         """Get current timestamp in milliseconds"""
         return int(time.time() * 1000)
     
-    def _sign(self, params: Dict) -> str:
-        """Generate HMAC SHA256 signature"""
-        query_string = urlencode(params)
-        signature = hmac.new(
-            self.api_secret.encode('utf-8'),
+    def _sign(self, query_string: str) -> str:
+        """Generate HMAC SHA256 signature for an encoded query string"""
+        return hmac.digest(
+            self._secret_bytes,
             query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
-    
-    def _rate_limit(self):
-        """Simple rate limiting"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            time.sleep(self.min_request_interval - elapsed)
-        self.last_request_time = time.time()
+            'sha256'
+        ).hex()
+    
+    def _rate_limit(self, reserve: int = 0):
+        """Rate limiting driven by used request weight, with a small floor"""
+        self._wait_for_weight(reserve)
+        with self._rate_lock:
+            elapsed = time.monotonic() - self.last_request_time
+            if elapsed < self.min_request_interval:
+                time.sleep(self.min_request_interval - elapsed)
+            self.last_request_time = time.monotonic()
+    
+    def _update_weight(self, response: requests.Response):
+        """Track used request weight from Binance response headers"""
+        used = response.headers.get('X-MBX-USED-WEIGHT-1M')
+        if used is not None:
+            with self._rate_lock:
+                self._weight_used = int(used)
+                # Weight window resets at the start of every minute
+                self._weight_reset = (int(time.time()) // 60 + 1) * 60
+    
+    def _wait_for_weight(self, reserve: int = 0):
+        """
+        Block only when used weight is within `reserve` of the per-minute limit
+        
+        Args:
+            reserve: Weight to leave free for other calls (0 = hard cap)
+        """
+        while True:
+            with self._rate_lock:
+                if time.time() >= self._weight_reset:
+                    self._weight_used = 0  # New minute window
+                if self._weight_used < self.weight_limit - reserve:
+                    return
+                used = self._weight_used
+                wait = self._weight_reset - time.time()
+            
+            # Sleep outside the lock so calls with a smaller reserve pass
+            logger.warning(f"Request weight {used}/{self.weight_limit} - pausing {wait:.1f}s")
+            time.sleep(max(wait, 0))
     
     def _request(self, method: str, endpoint: str, params: Dict = None, 
-                 signed: bool = False) -> Any:
-        """Make API request with error handling"""
+                 signed: bool = False, throttle: bool = True,
+                 decoder: Callable = None, bulk: bool = False) -> Any:
+        """
+        Make API request with error handling
+        
+        Batched reads pass throttle=False to skip the inter-request floor
+        and rely on the weight budget alone. Bulk scan reads (bulk=True:
+        klines, 24h tickers, batches) pause at the safety margin; all other
+        calls may use it up to the hard limit. A custom decoder can be given
+        to decode successful responses (e.g. into typed structs).
+        """
         
-        self._rate_limit()
+        reserve = self.weight_safety_margin if bulk else 0
+        if throttle:
+            self._rate_limit(reserve)
+        else:
+            self._wait_for_weight(reserve)
         
         url = f"{self.base_url}{endpoint}"
         params = params or {}
         
         if signed:
+            # Encode once and reuse the same string for signing and sending
             params['timestamp'] = self._get_timestamp()
-            params['signature'] = self._sign(params)
+            query_string = urlencode(params)
+            url = f"{url}?{query_string}&signature={self._sign(query_string)}"
+            params = None
         
         try:
             if method == 'GET':
@@ -76,25 +200,64 @@ class BinanceClient:
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"HTTP Error: {e}"
-            try:
-                error_data = response.json()
-                error_code = error_data.get('code')
-                error_msg = f"API Error {error_code}: {error_data.get('msg')}"
-                # Don't log harmless errors
-                if error_code != -4046:  # "No need to change margin type"
-                    logger.error(error_msg)
-            except:
-                logger.error(error_msg)
-            raise Exception(error_msg)
-            
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
             raise
+        
+        self._update_weight(response)
+        
+        # Happy path: single decode of the body
+        if response.status_code < 400:
+            try:
+                return (decoder or json_loads)(response.content)
+            except ValueError as e:
+                # Non-JSON 2xx body (e.g. a proxy or maintenance page)
+                logger.error(f"Request failed: invalid JSON in {response.status_code} response for url: {response.url}: {e}")
+                raise
+        
+        error_msg = f"HTTP Error: {response.status_code} {response.reason} for url: {response.url}"
+        try:
+            error_data = json_loads(response.content)
+        except ValueError:
+            error_data = None
+        
+        if isinstance(error_data, dict):
+            error_code = error_data.get('code')
+            error_msg = f"API Error {error_code}: {error_data.get('msg')}"
+            # Don't log harmless errors
+            if error_code != -4046:  # "No need to change margin type"
+                logger.error(error_msg)
+        else:
+            logger.error(error_msg)
+        raise Exception(error_msg)
+    
+    def _batch_request(self, calls: List[Tuple[str, Dict]]) -> List[Any]:
+        """
+        Run independent GET requests concurrently over the shared session
+        
+        Requests skip the inter-request floor and are gated by the used
+        request weight only, so their round-trips overlap.
+        
+        Args:
+            calls: List of (endpoint, params) tuples
+        
+        Returns:
+            List of responses in the same order (None for failed calls)
+        """
+        if not calls:
+            return []
+        
+        def fetch(call):
+            endpoint, params = call
+            try:
+                return self._request('GET', endpoint, params, throttle=False, bulk=True)
+            except Exception as e:
+                logger.debug(f"Batch request failed for {endpoint} {params}: {e}")
+                return None
+        
+        workers = min(self.max_batch_workers, len(calls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch, calls))
     
     # =========================================================================
     # Market Data Endpoints
@@ -106,8 +269,43 @@ class BinanceClient:
         return data['serverTime']
     
     def get_exchange_info(self) -> Dict:
-        """Get exchange information"""
-        return self._request('GET', '/fapi/v1/exchangeInfo')
+        """Get exchange information (cached for exchange_info_ttl seconds)"""
+        if (self._exchange_info_cache is None or
+                time.monotonic() - self._exchange_info_ts >= self.exchange_info_ttl):
+            exchange_info = self._request('GET', '/fapi/v1/exchangeInfo')
+            self._index_symbols(exchange_info)
+            self._exchange_info_cache = exchange_info
+            self._exchange_info_ts = time.monotonic()
+        return self._exchange_info_cache
+    
+    def _index_symbols(self, exchange_info: Dict):
+        """Index symbols by name and precompute their rounding rules"""
+        symbol_index = {}
+        symbol_meta = {}
+        
+        for s in exchange_info.get('symbols', []):
+            symbol = s['symbol']
+            symbol_index[symbol] = s
+            
+            tick_size = 0.0
+            tick_decimals = 0
+            for f in s.get('filters', []):
+                if f.get('filterType') == 'PRICE_FILTER':
+                    tick_str = str(f.get('tickSize', '0'))
+                    tick_size = float(tick_str)
+                    if '.' in tick_str:
+                        tick_decimals = len(tick_str.rstrip('0').split('.')[1])
+                    break
+            
+            symbol_meta[symbol] = (
+                tick_size,
+                tick_decimals,
+                s.get('pricePrecision', 2),
+                s.get('quantityPrecision', 3)
+            )
+        
+        self._symbol_index = symbol_index
+        self._symbol_meta = symbol_meta
     
     def get_klines(self, symbol: str, interval: str, limit: int = 100) -> List:
         """
@@ -121,19 +319,72 @@ class BinanceClient:
         Returns:
             List of klines [open_time, open, high, low, close, volume, ...]
         """
+        if self.market_data:
+            klines = self.market_data.get_klines(symbol, interval, limit)
+            if klines:
+                return klines
+        
         params = {
             'symbol': symbol,
             'interval': interval,
             'limit': limit
         }
-        return self._request('GET', '/fapi/v1/klines', params)
+        klines = self._request('GET', '/fapi/v1/klines', params, bulk=True)
+        
+        if self.market_data:
+            self.market_data.watch_klines(symbol, interval, klines)
+        
+        return klines
+    
+    def batch_klines(self, symbols: List[str], interval: str, 
+                     limit: int = 100) -> Dict[str, List]:
+        """
+        Get klines for many symbols concurrently
+        
+        Returns:
+            Dict of symbol -> klines (symbols that failed are omitted)
+        """
+        klines_map = {}
+        if self.market_data:
+            for s in symbols:
+                klines = self.market_data.get_klines(s, interval, limit)
+                if klines:
+                    klines_map[s] = klines
+        
+        missing = [s for s in symbols if s not in klines_map]
+        calls = [
+            ('/fapi/v1/klines', {'symbol': s, 'interval': interval, 'limit': limit})
+            for s in missing
+        ]
+        results = self._batch_request(calls)
+        
+        for s, klines in zip(missing, results):
+            if klines:
+                klines_map[s] = klines
+                if self.market_data:
+                    self.market_data.watch_klines(s, interval, klines)
+        
+        return klines_map
     
     def get_ticker_24h(self, symbol: str = None) -> Any:
-        """Get 24h ticker statistics"""
+        """Get 24h ticker statistics (from the stream cache when available)"""
+        if self.market_data:
+            if symbol:
+                cached = self.market_data.get_ticker(symbol)
+            else:
+                cached = self.market_data.get_tickers()
+            if cached:
+                return cached
+        
         params = {}
         if symbol:
             params['symbol'] = symbol
-        return self._request('GET', '/fapi/v1/ticker/24hr', params)
+        tickers = self._request('GET', '/fapi/v1/ticker/24hr', params, bulk=True)
+        
+        if self.market_data and not symbol:
+            self.market_data.seed_tickers(tickers)
+        
+        return tickers
     
     def get_mark_price(self, symbol: str = None) -> Any:
         """Get mark price"""
@@ -142,25 +393,76 @@ class BinanceClient:
             params['symbol'] = symbol
         return self._request('GET', '/fapi/v1/premiumIndex', params)
     
-    def get_top_pairs_by_volume(self, count: int = 30) -> List[str]:
-        """Get top trading pairs sorted by 24h volume"""
+    def _get_ticker_records(self) -> List[Tuple[str, float, float]]:
+        """
+        Get 24h tickers as (symbol, quoteVolume, priceChangePercent) tuples
+        
+        With streaming enabled this goes through get_ticker_24h, so a REST
+        fallback also re-seeds the stream cache. Otherwise the REST payload
+        is decoded straight into typed structs when msgspec is installed.
+        """
+        if not self.market_data and _TICKER_DECODER is not None:
+            structs = self._request('GET', '/fapi/v1/ticker/24hr',
+                                    decoder=_TICKER_DECODER.decode, bulk=True)
+            return [(t.symbol, t.quoteVolume, t.priceChangePercent) for t in structs]
+        
         tickers = self.get_ticker_24h()
+        return [
+            (t['symbol'], float(t.get('quoteVolume', 0)),
+             float(t.get('priceChangePercent', 0)))
+            for t in tickers
+        ]
+    
+    def get_ticker_soa(self) -> Dict[str, np.ndarray]:
+        """
+        Get USDT perpetual 24h tickers as parallel arrays (structure-of-arrays)
+        
+        Returns:
+            Dict with 'symbol', 'quoteVolume' and 'priceChangePercent' arrays
+        """
+        records = self._get_ticker_records()
+        quote_asset = config.QUOTE_ASSET
+        exclude = EXCLUDED_SYMBOL_RE.search
         
         # Filter USDT perpetual pairs only
         usdt_pairs = [
-            t for t in tickers 
-            if t['symbol'].endswith(config.QUOTE_ASSET) 
-            and not any(x in t['symbol'] for x in ['_', 'DEFI', 'INDEX'])
+            r for r in records
+            if r[0].endswith(quote_asset) and not exclude(r[0])
         ]
+        n = len(usdt_pairs)
         
-        # Sort by quote volume (USDT volume)
-        sorted_pairs = sorted(
-            usdt_pairs, 
-            key=lambda x: float(x['quoteVolume']), 
-            reverse=True
-        )
+        return {
+            'symbol': np.array([r[0] for r in usdt_pairs], dtype=object),
+            'quoteVolume': np.fromiter(
+                (r[1] for r in usdt_pairs), dtype=np.float64, count=n
+            ),
+            'priceChangePercent': np.fromiter(
+                (r[2] for r in usdt_pairs), dtype=np.float64, count=n
+            ),
+        }
+    
+    @staticmethod
+    def _top_symbols(values: np.ndarray, symbols: np.ndarray, count: int) -> List[str]:
+        """Get the symbols with the `count` largest values (highest first)"""
+        n = len(values)
+        if n == 0 or count <= 0:
+            return []
+        
+        # Partition out the top-k, then sort only those
+        if count < n:
+            idx = np.argpartition(-values, count - 1)[:count]
+        else:
+            idx = np.arange(n)
+        idx = idx[np.argsort(-values[idx], kind='stable')]
+        
+        return symbols[idx].tolist()
+    
+    def get_top_pairs_by_volume(self, count: int = 30) -> List[str]:
+        """Get top trading pairs sorted by 24h volume"""
+        soa = self.get_ticker_soa()
         
-        return [p['symbol'] for p in sorted_pairs[:count]]
+        # Rank by quote volume (USDT volume)
+        return self._top_symbols(soa['quoteVolume'], soa['symbol'], count)
     
     def get_top_pairs_by_volatility(self, count: int = 30) -> List[str]:
         """
@@ -172,39 +474,24 @@ class BinanceClient:
         Returns:
             List of symbols sorted by volatility (highest first)
         """
-        tickers = self.get_ticker_24h()
+        soa = self.get_ticker_soa()
+        symbols = soa['symbol']
+        blacklist = _BLACKLIST
+        min_volatility = _MIN_VOLATILITY
         
-        # Filter USDT perpetual pairs only
-        usdt_pairs = [
-            t for t in tickers 
-            if t['symbol'].endswith(config.QUOTE_ASSET) 
-            and not any(x in t['symbol'] for x in ['_', 'DEFI', 'INDEX'])
-        ]
+        # Volatility = absolute price change; keep non-blacklisted pairs
+        # above the minimum
+        volatility = np.abs(soa['priceChangePercent'])
+        mask = volatility >= min_volatility
+        if blacklist:
+            mask &= np.fromiter(
+                (s not in blacklist for s in symbols),
+                dtype=bool, count=len(symbols)
+            )
         
-        # Apply blacklist filter
-        blacklist = getattr(config, 'BLACKLIST', [])
-        usdt_pairs = [
-            t for t in usdt_pairs 
-            if t['symbol'] not in blacklist
-        ]
+        logger.info(f"Found {int(mask.sum())} volatile pairs (min {min_volatility}%)")
         
-        # Filter by minimum volatility
-        min_volatility = getattr(config, 'MIN_VOLATILITY_PERCENT', 1.0)
-        volatile_pairs = [
-            t for t in usdt_pairs
-            if abs(float(t.get('priceChangePercent', 0))) >= min_volatility
-        ]
-        
-        # Sort by absolute price change (volatility)
-        sorted_pairs = sorted(
-            volatile_pairs, 
-            key=lambda x: abs(float(x.get('priceChangePercent', 0))), 
-            reverse=True
-        )
-        
-        logger.info(f"Found {len(sorted_pairs)} volatile pairs (min {min_volatility}%)")
-        
-        return [p['symbol'] for p in sorted_pairs[:count]]
+        return self._top_symbols(volatility[mask], symbols[mask], count)
     
     # =========================================================================
     # Account Endpoints
@@ -227,15 +514,40 @@ class BinanceClient:
         return 0.0
     
     def get_positions(self) -> List[Dict]:
-        """Get all open positions"""
-        account = self.get_account_info()
-        positions = account.get('positions', [])
+        """
+        Get all open positions
+        
+        Uses /fapi/v2/positionRisk, which returns only position data
+        instead of the full account payload (assets, margins, ...).
+        Positions are returned in the /fapi/v2/account shape callers were
+        written against; markPrice, unRealizedProfit and other
+        positionRisk-only fields are left out on purpose, since exposing
+        them activates partial-TP, breakeven and trailing-stop orders.
+        """
+        positions = self._request('GET', '/fapi/v2/positionRisk', signed=True)
         
         # Filter only positions with non-zero amount
-        open_positions = [
-            p for p in positions 
-            if float(p.get('positionAmt', 0)) != 0
-        ]
+        open_positions = []
+        for p in positions:
+            if float(p.get('positionAmt', 0)) == 0:
+                continue
+            
+            leverage = float(p.get('leverage', 0) or 0)
+            notional = abs(float(p.get('notional', 0) or 0))
+            open_positions.append({
+                'symbol': p['symbol'],
+                'positionAmt': p['positionAmt'],
+                'entryPrice': p.get('entryPrice', '0'),
+                'unrealizedProfit': p.get('unRealizedProfit', '0'),
+                'initialMargin': str(notional / leverage) if leverage > 0 else '0',
+                'leverage': p.get('leverage', '0'),
+                'isolated': p.get('marginType') == 'isolated',
+                'isolatedWallet': p.get('isolatedWallet', '0'),
+                'positionSide': p.get('positionSide', 'BOTH'),
+                'notional': p.get('notional', '0'),
+                'maxNotional': p.get('maxNotionalValue', '0'),
+                'updateTime': p.get('updateTime', 0),
+            })
         
         return open_positions
     
@@ -326,30 +638,39 @@ class BinanceClient:
     
     def get_symbol_info(self, symbol: str) -> Optional[Dict]:
         """Get symbol trading rules"""
-        exchange_info = self.get_exchange_info()
-        for s in exchange_info['symbols']:
-            if s['symbol'] == symbol:
-                return s
-        return None
+        self.get_exchange_info()
+        return self._symbol_index.get(symbol)
+    
+    def _get_symbol_meta(self, symbol: str) -> Optional[Tuple[float, int, int, int]]:
+        """Get precomputed (tick_size, tick_decimals, price_precision, quantity_precision)"""
+        self.get_exchange_info()
+        return self._symbol_meta.get(symbol)
     
     def get_price_precision(self, symbol: str) -> int:
         """Get price precision for a symbol"""
-        info = self.get_symbol_info(symbol)
-        if info:
-            return info.get('pricePrecision', 2)
+        meta = self._get_symbol_meta(symbol)
+        if meta:
+            return meta[2]
         return 2
     
     def get_quantity_precision(self, symbol: str) -> int:
         """Get quantity precision for a symbol"""
-        info = self.get_symbol_info(symbol)
-        if info:
-            return info.get('quantityPrecision', 3)
+        meta = self._get_symbol_meta(symbol)
+        if meta:
+            return meta[3]
         return 3
     
     def round_price(self, symbol: str, price: float) -> float:
-        """Round price to symbol precision"""
-        precision = self.get_price_precision(symbol)
-        return round(price, precision)
+        """Round price down to the symbol's tick size"""
+        meta = self._get_symbol_meta(symbol)
+        if not meta:
+            return round(price, 2)
+        
+        tick_size, tick_decimals, price_precision, _ = meta
+        if tick_size > 0:
+            # Small epsilon so exact multiples aren't lost to float error
+            return round(floor(price / tick_size + 1e-9) * tick_size, tick_decimals)
+        return round(price, price_precision)
     
     def round_quantity(self, symbol: str, quantity: float) -> float:
         """Round quantity to symbol precision"""
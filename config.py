@@ -25,6 +25,15 @@ PRODUCTION_BASE_URL = "https://fapi.binance.com"
 def get_base_url():
     return TESTNET_BASE_URL if USE_TESTNET else PRODUCTION_BASE_URL
 
+# WebSocket market data (streams tickers/klines instead of REST polling)
+MARKET_STREAM_ENABLED = False         # Requires the optional websockets package
+MARKET_STREAM_MAX_KLINES = 100        # Max kline streams kept in memory
+TESTNET_WS_URL = "wss://stream.binancefuture.com"
+PRODUCTION_WS_URL = "wss://fstream.binance.com"
+
+def get_ws_url():
+    return TESTNET_WS_URL if USE_TESTNET else PRODUCTION_WS_URL
+
 # =============================================================================
 # GROK AI CONFIGURATION
 # =============================================================================
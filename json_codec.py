@@ -0,0 +1,13 @@
+"""
+JSON Codec Module
+Fast JSON decoding shared by the REST client and the market data stream
+"""
+
+import json
+
+# Fast JSON decoder (optional)
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
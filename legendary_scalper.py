@@ -28,6 +28,10 @@ from grok_client import GrokClient
 from logger import logger
 
 
+# Maximum margin a single position can use across all steps
+_TOTAL_STEP_MARGIN = sum(config.MARTINGALE_STEPS)
+
+
 class LegendaryScalper:
     """
     Counter-trend Martingale scalper
@@ -73,7 +77,7 @@ class LegendaryScalper:
         logger.info(f"   Min Pump: {config.MARTINGALE_MIN_PUMP}%")
         logger.info(f"   Max Positions: {config.MARTINGALE_MAX_POSITIONS}")
         logger.info(f"   Steps: {config.MARTINGALE_STEPS}")
-        logger.info(f"   Total Max Margin: ${sum(config.MARTINGALE_STEPS)}")
+        logger.info(f"   Total Max Margin: ${_TOTAL_STEP_MARGIN}")
     
     def startup_checks(self) -> bool:
         """Perform startup checks"""
@@ -88,7 +92,7 @@ class LegendaryScalper:
             balance = self.client.get_usdt_balance()
             logger.info(f"✅ USDT Balance: {balance:.2f}")
             
-            if balance < sum(config.MARTINGALE_STEPS):
+            if balance < _TOTAL_STEP_MARGIN:
                 logger.warning(f"⚠️ Balance may be insufficient for full Martingale")
             
             # Recover existing positions from Binance
@@ -140,15 +144,26 @@ class LegendaryScalper:
         if current_time - self.last_pump_scan >= self.pump_scan_interval:
             self.last_pump_scan = current_time
             
-            opportunities = self.watcher.scan_for_new_entries()
+            opportunities = self.watcher.scan_for_new_entries()[:5]  # Open up to 5 positions per scan
+            
+            # Prefetch 1h klines concurrently, only for as many opportunities
+            # as there are free slots (skipped ones fetch their own)
+            free_slots = self.martingale.get_dynamic_max_positions() - len(self.martingale.positions)
+            klines_1h = {}
+            if free_slots > 1:
+                klines_1h = self.client.batch_klines(
+                    [opp['symbol'] for opp in opportunities[:free_slots]], '1h', 50
+                )
             
-            for opp in opportunities[:5]:  # Open up to 5 positions per scan
+            for opp in opportunities:
                 if self.martingale.can_open_new_position():
                     symbol = opp['symbol']
                     pump = opp['pump']
                     
                     # Check 1h trend for multi-timeframe confirmation
-                    trend_check = self.pump_detector.check_1h_trend(symbol)
+                    trend_check = self.pump_detector.check_1h_trend(
+                        symbol, klines_1h.get(symbol)
+                    )
                     if not trend_check.get('ok_to_short', True):
                         logger.info(f"⏭️ Skipping {symbol} - {trend_check.get('reason')}")
                         continue
@@ -186,7 +201,7 @@ class LegendaryScalper:
         print("="*65)
         print("Strategy: Counter-Trend SHORT on Pumped Coins")
         print(f"Min Pump: {config.MARTINGALE_MIN_PUMP}%")
-        print(f"Max Margin: ${sum(config.MARTINGALE_STEPS)}")
+        print(f"Max Margin: ${_TOTAL_STEP_MARGIN}")
         print(f"Mode: {'TESTNET' if config.USE_TESTNET else 'PRODUCTION'}")
         print("="*65 + "\n")
         
@@ -0,0 +1,324 @@
+"""
+Market Data Cache Module
+Streams 24h tickers and klines from Binance WebSockets into memory
+so scans read local data instead of polling REST endpoints
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+import websockets
+
+import config
+from json_codec import json_loads
+from logger import logger
+
+
+# WebSocket 24h ticker fields -> REST /fapi/v1/ticker/24hr fields
+TICKER_FIELDS = {
+    's': 'symbol',
+    'p': 'priceChange',
+    'P': 'priceChangePercent',
+    'w': 'weightedAvgPrice',
+    'c': 'lastPrice',
+    'Q': 'lastQty',
+    'o': 'openPrice',
+    'h': 'highPrice',
+    'l': 'lowPrice',
+    'v': 'volume',
+    'q': 'quoteVolume',
+    'O': 'openTime',
+    'C': 'closeTime',
+    'F': 'firstId',
+    'L': 'lastId',
+    'n': 'count',
+}
+
+
+class MarketDataCache:
+    """
+    Background WebSocket consumer for market data
+    
+    - !ticker@arr keeps every symbol's 24h ticker up to date
+    - <symbol>@kline_<interval> keeps a rolling buffer for watched symbols
+    
+    Buffers are dropped whenever the connection is lost, so callers fall
+    back to REST (and re-seed the cache) instead of reading gapped data.
+    Kline buffers that stop updating are treated the same way, and streams
+    nobody reads any more are unsubscribed to free room under the cap.
+    """
+    
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+        self.max_kline_streams = getattr(config, 'MARKET_STREAM_MAX_KLINES', 100)
+        self.ticker_max_age = 5  # seconds without an update before falling back to REST
+        self.kline_max_age = 30  # seconds without an update before a buffer is stale
+        self.kline_idle_timeout = 300  # seconds unread before a stream is unsubscribed
+        
+        # Binance drops connections sending more than 10 messages/second, so
+        # (un)subscriptions are queued and flushed as one frame per method
+        self.subscribe_interval = 0.5  # seconds between flushes (<= 4 msg/s)
+        
+        self._lock = threading.Lock()
+        self._tickers: Dict[str, Dict] = {}
+        self._tickers_seeded = False
+        self._last_ticker_update = 0
+        self._klines: Dict[str, deque] = {}  # stream name -> rolling klines
+        self._kline_updated: Dict[str, float] = {}  # stream name -> last update
+        self._kline_used: Dict[str, float] = {}  # stream name -> last read
+        self._pending_subscribe: Set[str] = set()
+        self._pending_unsubscribe: Set[str] = set()
+        
+        self._connected = False
+        self._running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws = None
+        self._request_id = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    # =========================================================================
+    # Lifecycle
+    # =========================================================================
+    
+    def start(self):
+        """Start the WebSocket consumer in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("📡 Market data stream started")
+    
+    def stop(self):
+        """Stop the WebSocket consumer"""
+        self._running = False
+        if self._loop and self._ws:
+            asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+    
+    def _run_loop(self):
+        """Thread entry point"""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._consume())
+    
+    async def _consume(self):
+        """Connect, read messages and reconnect on failure"""
+        url = f"{self.ws_url}/stream?streams=!ticker@arr"
+        
+        while self._running:
+            try:
+                async with websockets.connect(url, ping_interval=None) as ws:
+                    self._ws = ws
+                    self._connected = True
+                    logger.info("📡 Market data stream connected")
+                    
+                    sender = asyncio.ensure_future(self._send_pending(ws))
+                    try:
+                        async for message in ws:
+                            self._handle_message(message)
+                    finally:
+                        sender.cancel()
+            
+            except Exception as e:
+                if self._running:
+                    logger.warning(f"Market data stream error: {e}")
+            finally:
+                self._ws = None
+                self._connected = False
+                self._reset()
+            
+            if self._running:
+                await asyncio.sleep(5)
+    
+    def _reset(self):
+        """Drop cached data after a disconnect (it may have gaps)"""
+        with self._lock:
+            self._tickers.clear()
+            self._tickers_seeded = False
+            self._klines.clear()
+            self._kline_updated.clear()
+            self._kline_used.clear()
+            self._pending_subscribe.clear()
+            self._pending_unsubscribe.clear()
+    
+    # =========================================================================
+    # Message Handling
+    # =========================================================================
+    
+    def _handle_message(self, message):
+        """Dispatch a combined-stream message"""
+        payload = json_loads(message)
+        stream = payload.get('stream') if isinstance(payload, dict) else None
+        if not stream:
+            return  # SUBSCRIBE acknowledgements
+        
+        data = payload['data']
+        if stream == '!ticker@arr':
+            self._update_tickers(data)
+        elif '@kline_' in stream:
+            self._update_kline(stream, data['k'])
+    
+    def _update_tickers(self, tickers: List[Dict]):
+        """Merge changed tickers into the cache (REST field names)"""
+        with self._lock:
+            for t in tickers:
+                self._tickers[t['s']] = {
+                    name: t[key] for key, name in TICKER_FIELDS.items() if key in t
+                }
+            self._last_ticker_update = time.monotonic()
+    
+    def _update_kline(self, stream: str, k: Dict):
+        """Update or append the latest candle (REST kline row format)"""
+        row = [
+            k['t'], k['o'], k['h'], k['l'], k['c'], k['v'],
+            k['T'], k['q'], k['n'], k['V'], k['Q'], '0'
+        ]
+        with self._lock:
+            buffer = self._klines.get(stream)
+            if not buffer:
+                return
+            last_open_time = buffer[-1][0]
+            if row[0] == last_open_time:
+                buffer[-1] = row
+            elif row[0] > last_open_time:
+                buffer.append(row)
+            self._kline_updated[stream] = time.monotonic()
+    
+    # =========================================================================
+    # Subscriptions
+    # =========================================================================
+    
+    async def _send_pending(self, ws):
+        """Flush queued (un)subscriptions, at most one frame per method per interval"""
+        while True:
+            await asyncio.sleep(self.subscribe_interval)
+            for message in self._drain_pending():
+                await ws.send(message)
+    
+    def _drain_pending(self) -> List[str]:
+        """Build the batched UNSUBSCRIBE/SUBSCRIBE frames for queued streams"""
+        messages = []
+        with self._lock:
+            self._drop_idle_streams()
+            for method, pending in (('UNSUBSCRIBE', self._pending_unsubscribe),
+                                    ('SUBSCRIBE', self._pending_subscribe)):
+                if not pending:
+                    continue
+                self._request_id += 1
+                messages.append(json.dumps({
+                    'method': method,
+                    'params': sorted(pending),
+                    'id': self._request_id
+                }))
+                pending.clear()
+        return messages
+    
+    def _drop_idle_streams(self):
+        """Unsubscribe kline streams nobody has read recently (lock held)"""
+        cutoff = time.monotonic() - self.kline_idle_timeout
+        for stream, last_used in list(self._kline_used.items()):
+            if last_used < cutoff:
+                self._drop_stream(stream)
+    
+    def _drop_stream(self, stream: str):
+        """Forget a kline buffer and queue its UNSUBSCRIBE (lock held)"""
+        self._klines.pop(stream, None)
+        self._kline_updated.pop(stream, None)
+        self._kline_used.pop(stream, None)
+        self._pending_subscribe.discard(stream)
+        self._pending_unsubscribe.add(stream)
+    
+    # =========================================================================
+    # Tickers
+    # =========================================================================
+    
+    def seed_tickers(self, tickers: List[Dict]):
+        """Fill the ticker cache from a REST snapshot"""
+        if not self._connected:
+            return
+        with self._lock:
+            for t in tickers:
+                self._tickers.setdefault(t['symbol'], t)
+            self._tickers_seeded = True
+            self._last_ticker_update = time.monotonic()
+    
+    def _tickers_fresh(self) -> bool:
+        return (
+            self._connected and self._tickers_seeded and
+            time.monotonic() - self._last_ticker_update < self.ticker_max_age
+        )
+    
+    def get_tickers(self) -> Optional[List[Dict]]:
+        """Get all cached 24h tickers, or None if the cache is not usable"""
+        with self._lock:
+            if not self._tickers_fresh():
+                return None
+            return list(self._tickers.values())
+    
+    def get_ticker(self, symbol: str) -> Optional[Dict]:
+        """Get one cached 24h ticker, or None if not available"""
+        with self._lock:
+            if not self._tickers_fresh():
+                return None
+            return self._tickers.get(symbol)
+    
+    # =========================================================================
+    # Klines
+    # =========================================================================
+    
+    def _kline_fresh(self, stream: str) -> bool:
+        return (
+            self._connected and
+            time.monotonic() - self._kline_updated.get(stream, 0) < self.kline_max_age
+        )
+    
+    def watch_klines(self, symbol: str, interval: str, klines: List):
+        """
+        Seed a kline buffer from REST data and queue its stream subscription
+        
+        When the cap is reached, the least recently read stream is dropped
+        to make room. Stale buffers are re-seeded and re-subscribed.
+        
+        Args:
+            symbol: Trading pair
+            interval: Kline interval
+            klines: REST klines to seed the buffer with
+        """
+        if not self._connected or not klines:
+            return
+        
+        stream = f"{symbol.lower()}@kline_{interval}"
+        now = time.monotonic()
+        with self._lock:
+            buffer = self._klines.get(stream)
+            is_stale = not self._kline_fresh(stream)
+            
+            if buffer is None and len(self._klines) >= self.max_kline_streams:
+                if not self._kline_used:
+                    return
+                self._drop_stream(min(self._kline_used, key=self._kline_used.get))
+            
+            if buffer is None or is_stale or len(klines) > buffer.maxlen:
+                self._klines[stream] = deque(klines, maxlen=len(klines))
+                self._kline_updated[stream] = now
+            self._kline_used[stream] = now
+            
+            if buffer is None or is_stale:
+                self._pending_unsubscribe.discard(stream)
+                self._pending_subscribe.add(stream)
+    
+    def get_klines(self, symbol: str, interval: str, limit: int) -> Optional[List]:
+        """Get cached klines, or None if the buffer is missing, stale or too short"""
+        stream = f"{symbol.lower()}@kline_{interval}"
+        with self._lock:
+            buffer = self._klines.get(stream)
+            if not buffer:
+                return None
+            self._kline_used[stream] = time.monotonic()
+            if len(buffer) < limit or not self._kline_fresh(stream):
+                return None
+            return list(buffer)[-limit:]
@@ -27,6 +27,9 @@ class PositionWatcher:
         # Take profit settings
         self.take_profit_percent = getattr(config, 'MARTINGALE_TP_PERCENT', 1.5)
         
+        # Status formatting (step count is fixed for the process lifetime)
+        self._step_fmt = "Step {}/" + str(len(self.martingale.STEPS))
+        
         logger.info("👁️ Position Watcher initialized")
     
     def check_positions(self) -> Dict:
@@ -323,16 +326,23 @@ class PositionWatcher:
         # Refresh pumped coins list
         pumped = self.pump_detector.find_pumped_coins()
         
-        for coin in pumped[:10]:  # Check top 10 pumped
+        # Skip coins we already have a position in
+        candidates = [
+            coin for coin in pumped[:10]  # Check top 10 pumped
+            if not self.martingale.has_position(coin['symbol'])
+        ]
+        
+        # Prefetch klines for all candidates concurrently
+        klines_map = self.client.batch_klines(
+            [coin['symbol'] for coin in candidates], '5m', 50
+        )
+        
+        for coin in candidates:
             symbol = coin['symbol']
             
-            # Skip if already have position
-            if self.martingale.has_position(symbol):
-                continue
-            
             try:
                 # Get klines for entry check
-                klines = self.client.get_klines(symbol, '5m', 50)
+                klines = klines_map.get(symbol)
                 if not klines:
                     continue
                 
@@ -384,7 +394,8 @@ class PositionWatcher:
                     upnl = (position.average_entry - current_price) * position.total_quantity
                     upnl_percent = ((position.average_entry - current_price) / position.average_entry) * 100
                     
-                    logger.info(f"   {symbol}: Step {pos['step']}/9 | Avg {pos['average_entry']:.6f}")
+                    step_label = self._step_fmt.format(pos['step'])
+                    logger.info(f"   {symbol}: {step_label} | Avg {pos['average_entry']:.6f}")
                     logger.info(f"      Margin: ${pos['total_margin']} | UPnL: ${upnl:.2f} ({upnl_percent:+.2f}%)")
                     
             except Exception as e:
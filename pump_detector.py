@@ -6,6 +6,7 @@ import time
 from typing import List, Dict, Optional
 from logger import logger
 import config
+from binance_client import EXCLUDED_SYMBOL_RE
 
 
 class PumpDetector:
@@ -43,7 +44,7 @@ class PumpDetector:
                     continue
                     
                 # Skip special pairs
-                if any(x in symbol for x in ['_', 'DEFI', 'INDEX']):
+                if EXCLUDED_SYMBOL_RE.search(symbol):
                     continue
                 
                 # Skip blacklisted symbols
@@ -186,7 +187,7 @@ class PumpDetector:
                 return coin
         return None
     
-    def check_1h_trend(self, symbol: str) -> Dict:
+    def check_1h_trend(self, symbol: str, klines: Optional[List] = None) -> Dict:
         """
         Check 1h timeframe for trend confirmation
         
@@ -195,12 +196,17 @@ class PumpDetector:
         - If 1h RSI > 60 + price near resistance: OK for SHORT
         - If 1h RSI < 50: Skip SHORT (still in uptrend)
         
+        Args:
+            symbol: Trading pair
+            klines: Prefetched 1h klines (fetched here if not given)
+        
         Returns:
             Dict with ok_to_short, reason, rsi_1h
         """
         try:
             # Get 1h klines
-            klines = self.client.get_klines(symbol, '1h', limit=50)
+            if klines is None:
+                klines = self.client.get_klines(symbol, '1h', limit=50)
             
             if not klines or len(klines) < 20:
                 return {
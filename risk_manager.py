@@ -13,7 +13,6 @@ class RiskManager:
     
     def __init__(self, client):
         self.client = client
-        self._symbol_info_cache = {}
     
     def get_capital(self) -> float:
         """Get trading capital (fixed or from balance)"""
@@ -23,12 +22,8 @@ class RiskManager:
             return self.client.get_usdt_balance()
     
     def get_symbol_info(self, symbol: str) -> Dict:
-        """Get and cache symbol info"""
-        if symbol not in self._symbol_info_cache:
-            info = self.client.get_symbol_info(symbol)
-            if info:
-                self._symbol_info_cache[symbol] = info
-        return self._symbol_info_cache.get(symbol, {})
+        """Get symbol info (already indexed and cached by the client)"""
+        return self.client.get_symbol_info(symbol) or {}
     
     def calculate_position_size(self, symbol: str, entry_price: float, 
                                  stop_loss_price: float) -> float: